@@ -1,9 +1,32 @@
 import streamlit as st
-from tavily import TavilyClient
+import diskcache
+import httpx
+import requests
+import numpy as np
+from sentence_transformers import SentenceTransformer
+import asyncio
 import os
-from typing import List, Dict, Optional
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 import re
 
+# Fixed site-restriction suffix appended to every search query
+_SITE_SUFFIX = (
+    " site:geeksforgeeks.org OR site:stackoverflow.com OR "
+    "site:w3schools.com OR site:codegrepper.com OR site:realpython.com"
+)
+
+EXAMPLE_QUESTIONS = (
+    "How to reverse a string in Python?",
+    "What's the difference between list and tuple?",
+    "How to read a CSV file in Pandas?",
+    "Explain Python decorators with examples",
+    "How to handle exceptions in Python?"
+)
+
 # Set page config
 st.set_page_config(
     page_title="Enhanced Code Answer Search",
@@ -11,104 +34,333 @@ st.set_page_config(
     layout="centered"
 )
 
-# Initialize Tavily client
-def get_tavily_client() -> Optional[TavilyClient]:
-    """Initialize and return Tavily client with error handling"""
+# One pooled session for result-page fetches so consecutive downloads
+# reuse warm TCP/TLS connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=10, pool_maxsize=10, max_retries=1
+))
+
+# Initialize the Tavily API client
+@st.cache_resource(show_spinner=False)
+def get_http_client() -> Optional[httpx.Client]:
+    """Return a shared warmed HTTP/2 client for the Tavily API
+
+    The app only uses Tavily's /search endpoint, so a plain httpx client
+    replaces the SDK: one connection is kept alive process-wide and
+    every search after the first skips DNS, TCP and TLS setup.
+    """
     try:
-        return TavilyClient(api_key=st.secrets["TAVILY_API_KEY"])
+        return httpx.Client(
+            base_url="https://api.tavily.com",
+            headers={"Authorization": f"Bearer {st.secrets['TAVILY_API_KEY']}"},
+            timeout=15,
+            transport=httpx.HTTPTransport(http2=True, retries=1)
+        )
     except Exception as e:
         st.error(f"Failed to initialize search client: {str(e)}")
         return None
 
+# Semantic cache: near-duplicate questions ("reverse a string in python"
+# vs "python string reversal") hit the same cached response instead of
+# triggering separate API calls.
+_SEMANTIC_CACHE_PATH = Path.home() / ".cache" / "code_search_app" / "semantic_cache.pkl"
+_SEMANTIC_THRESHOLD = 0.92
+_SEMANTIC_MAX_ENTRIES = 500
+_SEMANTIC_LOCK = threading.Lock()
+
+@st.cache_resource(show_spinner=False)
+def get_embedding_model() -> Optional[SentenceTransformer]:
+    """Load the lightweight sentence embedding model once per process"""
+    try:
+        return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    except Exception:
+        # Semantic caching is best-effort; searches still work without it
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _semantic_cache_entries() -> List[Dict]:
+    """(embedding, response, hits) entries, restored from disk if present"""
+    try:
+        with open(_SEMANTIC_CACHE_PATH, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return []
+
+def _embed_question(question: str) -> Optional[np.ndarray]:
+    model = get_embedding_model()
+    if not model:
+        return None
+    return model.encode(question, normalize_embeddings=True)
+
+def semantic_cache_get(question: str) -> Optional[Dict]:
+    """Return a cached response for a semantically similar prior question"""
+    embedding = _embed_question(question)
+    if embedding is None:
+        return None
+    with _SEMANTIC_LOCK:
+        entries = _semantic_cache_entries()
+        if not entries:
+            return None
+        similarities = np.stack([e['embedding'] for e in entries]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < _SEMANTIC_THRESHOLD:
+            return None
+        entries[best]['hits'] += 1
+        return entries[best]['response']
+
+def semantic_cache_put(question: str, response: Dict):
+    """Store a fresh response under the question's embedding"""
+    embedding = _embed_question(question)
+    if embedding is None:
+        return
+    with _SEMANTIC_LOCK:
+        entries = _semantic_cache_entries()
+        entries.append({'embedding': embedding, 'response': response, 'hits': 0})
+        if len(entries) > _SEMANTIC_MAX_ENTRIES:
+            # LFU eviction: drop the least-hit entry
+            entries.pop(min(range(len(entries)), key=lambda i: entries[i]['hits']))
+        try:
+            _SEMANTIC_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(_SEMANTIC_CACHE_PATH, 'wb') as f:
+                pickle.dump(entries, f)
+        except Exception:
+            pass  # persistence is opportunistic; the in-memory copy still works
+
+# L2 response cache: shared between worker processes and survives
+# restarts, unlike st.cache_data which is per-process memory only
+_DISK_CACHE = diskcache.Cache("/tmp/tavily_cache", size_limit=200 * 1024 * 1024)
+_DISK_CACHE_TTL = 86400
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def _cached_tavily_search(query: str, depth: str, max_results: int) -> Dict:
+    """Run a Tavily search, memoizing responses in memory and on disk"""
+    key = ("v1", query, depth, max_results)
+    if (response := _DISK_CACHE.get(key)) is not None:
+        return response
+
+    client = get_http_client()
+    if not client:
+        raise RuntimeError("Search client unavailable")
+    api_response = client.post("/search", json={
+        "query": query,
+        "search_depth": depth,
+        "include_answer": True,
+        "include_raw_content": False,
+        "max_results": max_results
+    })
+    api_response.raise_for_status()
+    response = api_response.json()
+    _DISK_CACHE.set(key, response, expire=_DISK_CACHE_TTL)
+    return response
+
 def search_coding_answers(question: str) -> Optional[Dict]:
     """Enhanced search for coding answers"""
-    tavily_client = get_tavily_client()
-    if not tavily_client:
-        return None
-    
-    search_query = (
-        f"{question} site:geeksforgeeks.org OR site:stackoverflow.com OR "
-        "site:w3schools.com OR site:codegrepper.com OR site:realpython.com"
-    )
-    
+    search_query = question + _SITE_SUFFIX
+
     try:
-        response = tavily_client.search(
-            query=search_query,
-            search_depth="advanced",
-            include_answer=True,
-            include_raw_content=True,
-            max_results=7
-        )
+        if (cached := semantic_cache_get(question)) is not None:
+            return cached
+        # Basic depth is roughly twice as fast (and cheaper) than
+        # advanced; escalate only when the quick pass comes back thin
+        response = _cached_tavily_search(search_query, "basic", 5)
+        if not response.get("answer") or len(response.get("results", [])) < 3:
+            response = _cached_tavily_search(search_query, "advanced", 7)
+        semantic_cache_put(question, response)
         return response
     except Exception as e:
         st.error(f"Search failed: {str(e)}")
         return None
 
+async def _async_search_one(client: httpx.AsyncClient, question: str) -> Tuple[str, Optional[Dict]]:
+    try:
+        response = await client.post("/search", json={
+            "api_key": st.secrets["TAVILY_API_KEY"],
+            "query": question + _SITE_SUFFIX,
+            "search_depth": "advanced",
+            "include_answer": True,
+            "include_raw_content": False,
+            "max_results": 7
+        })
+        response.raise_for_status()
+        return question, response.json()
+    except Exception:
+        return question, None
+
+async def _async_batch(questions: List[str]) -> Dict[str, Dict]:
+    async with httpx.AsyncClient(base_url="https://api.tavily.com",
+                                 http2=True, timeout=30) as client:
+        pairs = await asyncio.gather(*[_async_search_one(client, q) for q in questions])
+    return {question: response for question, response in pairs if response}
+
+def batch_search(questions: List[str]) -> Dict[str, Dict]:
+    """Run several searches concurrently, keyed by question
+
+    Tavily has no native multi-query endpoint, so the calls fan out on a
+    single asyncio event loop over one HTTP/2 connection; total wall
+    time is roughly the slowest single search instead of the sum, with
+    no thread-pool startup cost.
+    """
+    try:
+        return asyncio.run(_async_batch(list(questions)))
+    except Exception:
+        return {}
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def prewarm_examples() -> Dict[str, Dict]:
+    """Fetch the canned example questions once so clicking them is instant"""
+    return batch_search(list(EXAMPLE_QUESTIONS))
+
+# Upper bound on scanned content so pathological upstream payloads
+# cannot stall the worker
+_MAX_CONTENT_LEN = 200_000
+
+# Per-result cap on raw_content fed into extraction; bounds parse time
+# and memory no matter how large the fetched page was
+_RAW_CONTENT_CAP = 32_768
+
+# Compiled once at import; used to normalize whitespace when
+# deduplicating rendered code blocks
+_WS_RE = re.compile(r'\s+')
+
 def extract_code_blocks(content: str) -> List[str]:
-    """Improved code extraction with better pattern matching"""
+    """Improved code extraction with better pattern matching
+
+    Scans with str.find instead of a regex: a pair of C-level substring
+    searches per block, no automaton state and no backtracking, so the
+    worst case stays linear even on huge HTML dumps.
+    """
     if not content:
         return []
-    
-    # Enhanced regex pattern for code blocks
-    code_pattern = re.compile(
-        r'```(?:python)?\n(.*?)```|'
-        r'<code>(.*?)</code>|'
-        r'(?:def|class)\s+\w+.*?:\n(?:    .*\n)+',
-        re.DOTALL
-    )
-    
-    matches = code_pattern.findall(content)
+    content = content[:_MAX_CONTENT_LEN]
+
     code_blocks = []
-    
-    for match in matches:
-        block = '\n'.join([m for m in match if m.strip()])
-        if block:
-            # Clean up the code block
-            block = re.sub(r'^\s*\n', '', block)  
-            block = re.sub(r'\s+$', '', block)    
-            code_blocks.append(block)
-    
+    pos = 0
+    while (start := content.find('```', pos)) != -1:
+        end = content.find('```', start + 3)
+        if end == -1:
+            break
+        # Drop the language tag on the opening fence line
+        block = content[start + 3:end].split('\n', 1)[-1]
+        if block.strip():
+            code_blocks.append(block.rstrip())
+        pos = end + 3
+
+    pos = 0
+    while (start := content.find('<code>', pos)) != -1:
+        end = content.find('</code>', start + 6)
+        if end == -1:
+            break
+        block = content[start + 6:end]
+        if block.strip():
+            code_blocks.append(block.rstrip())
+        pos = end + len('</code>')
+
     return code_blocks
 
+# Pages fetched ahead of time by the background prefetcher; consulted
+# by fetch_raw before going to the network
+_PREFETCHED_PAGES: Dict[str, str] = {}
+_PREFETCH_LOCK = threading.Lock()
+
+def _fetch_page(url: str) -> str:
+    try:
+        response = _SESSION.get(url, timeout=5)
+        response.raise_for_status()
+        return response.text
+    except Exception:
+        return ""
+
+def _prefetch_pages(urls: List[str]):
+    """Warm the page cache for every result while the user reads
+
+    Runs on a detached thread pool so the fetches overlap with the user
+    reading the summaries; by the time a 'Load code snippets' button is
+    clicked the page is usually already in memory.
+    """
+    def worker(url: str):
+        text = _fetch_page(url)
+        with _PREFETCH_LOCK:
+            if len(_PREFETCHED_PAGES) >= 64:
+                _PREFETCHED_PAGES.clear()
+            _PREFETCHED_PAGES[url] = text
+
+    executor = ThreadPoolExecutor(max_workers=min(len(urls), 8))
+    for url in urls:
+        executor.submit(worker, url)
+    executor.shutdown(wait=False)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def fetch_raw(url: str) -> str:
+    """Fetch a result page on demand for code extraction"""
+    with _PREFETCH_LOCK:
+        if (text := _PREFETCHED_PAGES.get(url)) is not None:
+            return text
+    return _fetch_page(url)
+
 def display_results(results: Dict):
-    """Enhanced results display with better formatting"""
+    """Enhanced results display with lazily loaded code snippets"""
     if not results or not results.get('results'):
         st.warning("No results found. Try rephrasing your question.")
         return
-    
+
     st.subheader("Search Results")
-    
+
+    # Kick off background fetches for this result set exactly once
+    urls = [result['url'] for result in results['results']]
+    if st.session_state.get('prefetched_for') != urls:
+        _prefetch_pages(urls)
+        st.session_state.prefetched_for = urls
+
+    # Search responses no longer ship raw page content, so the initial
+    # render is just titles, links and summaries; each result's page is
+    # fetched and parsed only once the user asks for its snippets.
+    seen = set()
+    loaded = st.session_state.setdefault('loaded_snippets', set())
     for i, result in enumerate(results['results'], 1):
-        with st.expander(f"🔍 Result {i}: {result.get('title', 'Untitled')}"):
-            st.markdown(f"**Source:** [{result['url']}]({result['url']})")
-            
+        with st.expander(f"🔍 Result {i}: {result.get('title', 'Untitled')}", expanded=False):
+            url = result['url']
+            st.markdown(f"**Source:** [{url}]({url})")
+
             # Display answer if available
             if answer := result.get('answer'):
                 st.markdown("**Summary:**")
                 st.write(answer)
-            
-            # Display enhanced code snippets
-            if raw_content := result.get('raw_content'):
-                code_blocks = extract_code_blocks(raw_content)
+
+            if url not in loaded:
+                if st.button("Load code snippets", key=f"load_{i}"):
+                    loaded.add(url)
+
+            if url in loaded:
+                raw_content = result.get('raw_content') or fetch_raw(url)
+                if len(raw_content) > _RAW_CONTENT_CAP:
+                    raw_content = raw_content[:_RAW_CONTENT_CAP]
+                    st.caption("Content truncated — visit the source for the full page.")
+
+                # The same snippet is frequently syndicated across result
+                # sites; hash each whitespace-normalized block and render
+                # it only once.
+                code_blocks = []
+                for code in extract_code_blocks(raw_content):
+                    block_hash = hash(_WS_RE.sub(' ', code).strip())
+                    if block_hash in seen:
+                        continue
+                    seen.add(block_hash)
+                    code_blocks.append(code)
+
                 if code_blocks:
                     st.markdown("**Code Examples:**")
-                    for j, code in enumerate(code_blocks, 1):
+                    for code in code_blocks:
                         st.code(code, language='python')
                         st.markdown("---")
+                else:
+                    st.caption("No code snippets found on this page.")
 
 def display_example_questions():
     """Show clickable example questions"""
     st.markdown("**Try these examples:**")
-    examples = [
-        "How to reverse a string in Python?",
-        "What's the difference between list and tuple?",
-        "How to read a CSV file in Pandas?",
-        "Explain Python decorators with examples",
-        "How to handle exceptions in Python?"
-    ]
-    
-    for example in examples:
-        if st.button(example, key=f"example_{example}"):
+    for i, example in enumerate(EXAMPLE_QUESTIONS):
+        if st.button(example, key=f"ex{i}"):
             st.session_state.question = example
 
 def main():
@@ -118,7 +370,9 @@ def main():
     # Initialize session state
     if 'question' not in st.session_state:
         st.session_state.question = ""
-    
+    if 'prewarm' not in st.session_state:
+        st.session_state.prewarm = prewarm_examples()
+
     # Display example questions
     display_example_questions()
     
@@ -129,16 +383,22 @@ def main():
         placeholder="e.g., How to merge two dictionaries in Python?"
     )
     
-    if st.button("🔍 Search for Answers", type="primary"):
+    if st.button("🔍 Search for Answers", key="search", type="primary"):
         if not question.strip():
             st.warning("Please enter a question first.")
         else:
             with st.spinner("Searching across programming resources..."):
-                results = search_coding_answers(question)
+                results = st.session_state.prewarm.get(question) or search_coding_answers(question)
                 if results:
-                    display_results(results)
+                    # Keep results across reruns so the lazy snippet
+                    # buttons inside the expanders keep working
+                    st.session_state.results = results
+                    st.session_state.loaded_snippets = set()
                 else:
                     st.error("Failed to retrieve results. Please try again later.")
 
+    if results := st.session_state.get('results'):
+        display_results(results)
+
 if __name__ == "__main__":
     main()